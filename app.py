@@ -2,25 +2,67 @@ import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
 import io # Import io for handling file uploads in memory
+import os
+import re
+import tempfile
+from functools import partial
+import numpy as np
+from openpyxl import Workbook, load_workbook
+import pyarrow.parquet as pq
+
+# Default dataset used when nothing is uploaded
+DEFAULT_DATA_PATH = "penjualan_bersih.csv"
+
+# Number of rows serialized per step when streaming exports
+EXPORT_CHUNK_ROWS = 5000
+
+# Bounds for the server-wide cache of prepared sales data (one entry per distinct upload set)
+SALES_CACHE_MAX_ENTRIES = 8
+SALES_CACHE_TTL = "1h"
+
+# Upload layouts recognized by fingerprint_sales_file
+LAYOUT_NOTA = 'nota'     # Raw nota export: header row with 'TGL NOTA', products listed under each nota
+LAYOUT_BERSIH = 'bersih' # Already-clean schema, same columns as penjualan_bersih.csv
+NOTA_HEADER_COLUMNS = ['TGL NOTA', 'NAMA CUSTOMER', 'KOTA', 'KD LGN']
+CLEAN_COLUMNS = ['Tanggal', 'Customer', 'Kota', 'Nama Produk', 'Jumlah Terjual', 'Harga Satuan', 'Total Harga'] # 'Bulan' is derived from 'Tanggal'
+# Number of leading rows inspected when looking for a header row
+FINGERPRINT_ROWS = 30
+
+# Rules applied, in order, to product / customer names at ingest. Each rule is a
+# (regex, replacement) pair; names are stripped afterwards. Raw spellings that end up
+# identical share one ID and are kept as aliases in the name dictionary.
+NAME_NORMALIZATION_RULES = {
+    'Nama Produk': [
+        (r'\s+', ' '),       # 'LEM  KECIL BOYKO' -> 'LEM KECIL BOYKO'
+    ],
+    'Customer': [
+        (r'\s+', ' '),
+        (r'\s*\*+$', ''),    # 'KADAR BUDI**' -> 'KADAR BUDI'
+    ],
+}
 
 # ========================
 # Helper: Extract Dynamic Data
 # ========================
-def extract_sales_data_dynamic(df_raw):
+def extract_sales_data_dynamic(df_raw, header_row_idx=None):
     """
     Extracts sales data from a raw DataFrame, dynamically identifying header row.
 
     Args:
         df_raw (pd.DataFrame): The raw DataFrame loaded from an Excel file.
+        header_row_idx (int, optional): Header row found by fingerprint_sales_file. Used
+                                        when it points at the 'TGL NOTA' row, otherwise
+                                        the header is searched for.
 
     Returns:
         pd.DataFrame: A cleaned DataFrame containing sales records, or an empty DataFrame
                       if processing fails.
     """
     try:
-        # Find the header row based on the presence of "TGL NOTA"
+        # Find the header row based on the presence of "TGL NOTA", unless the fingerprint already located it
         # Using .astype(str) to handle mixed types and .str.contains for robust search
-        header_row_idx = df_raw[df_raw.apply(lambda row: row.astype(str).str.contains("TGL NOTA", na=False).any(), axis=1)].index[0]
+        if header_row_idx is None or header_row_idx >= len(df_raw) or 'TGL NOTA' not in df_raw.iloc[header_row_idx].values:
+            header_row_idx = df_raw[df_raw.apply(lambda row: row.astype(str).str.contains("TGL NOTA", na=False).any(), axis=1)].index[0]
         
         # Slice the DataFrame from the row after the header and set columns
         df = df_raw.iloc[header_row_idx + 1:].copy()
@@ -75,16 +117,180 @@ def extract_sales_data_dynamic(df_raw):
         st.error(f"Gagal memproses file. Terjadi kesalahan: {e}. Pastikan format file Excel sesuai.")
         return pd.DataFrame()
 
+# ========================
+# Helper: Upload Fingerprinting & Routing
+# ========================
+def fingerprint_sales_file(file):
+    """
+    Identifies the layout of an uploaded file by reading only its first rows
+    (or, for CSV and Parquet, only the header / schema).
+
+    Args:
+        file: Uploaded file object with a 'name' attribute (.xlsx, .csv or .parquet).
+
+    Returns:
+        tuple: (layout, header_row_idx) where layout is LAYOUT_NOTA, LAYOUT_BERSIH or None
+               if the file is not recognized, and header_row_idx is the 0-based header row.
+    """
+    ext = file.name.rsplit('.', 1)[-1].lower()
+    try:
+        if ext == 'xlsx':
+            # read_only streams rows from the sheet XML instead of loading the whole workbook.
+            # Inspect the first sheet, which is the one pd.read_excel parses by default
+            # (the saved active sheet can be a different one).
+            wb = load_workbook(file, read_only=True, data_only=True)
+            try:
+                head_rows = list(wb.worksheets[0].iter_rows(max_row=FINGERPRINT_ROWS, values_only=True))
+            finally:
+                wb.close()
+        elif ext == 'csv':
+            head_rows = [pd.read_csv(file, nrows=0).columns.tolist()]
+        elif ext == 'parquet':
+            head_rows = [pq.ParquetFile(file).schema_arrow.names]
+        else:
+            return None, None
+    except Exception:
+        # Unreadable or corrupt file: treat as unrecognized
+        return None, None
+    finally:
+        file.seek(0)
+
+    for idx, row in enumerate(head_rows):
+        cells = {cell for cell in row if isinstance(cell, str)}
+        if set(NOTA_HEADER_COLUMNS) <= cells:
+            # The nota layout is only ever exported as Excel
+            return (LAYOUT_NOTA, idx) if ext == 'xlsx' else (None, None)
+        if set(CLEAN_COLUMNS) <= cells:
+            return LAYOUT_BERSIH, idx
+    return None, None
+
+
+def coerce_clean_schema(df, source_name):
+    """
+    Converts the value columns of a clean-schema table and drops rows that do not parse.
+    The fingerprint only checks column names, so values are validated here.
+
+    Args:
+        df (pd.DataFrame): Table with CLEAN_COLUMNS.
+        source_name (str): File name used in the warning.
+
+    Returns:
+        pd.DataFrame: Rows with a valid 'Tanggal' and numeric quantity / price columns,
+                      or an empty DataFrame (with a warning) if none are valid.
+    """
+    df = df.copy()
+    numeric_columns = ['Jumlah Terjual', 'Harga Satuan', 'Total Harga']
+    df['Tanggal'] = pd.to_datetime(df['Tanggal'], errors='coerce')
+    for col in numeric_columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    valid = df['Tanggal'].notna() & df[numeric_columns].notna().all(axis=1)
+    if not valid.any():
+        st.warning(f"File '{source_name}' tidak berisi baris dengan tanggal dan angka yang valid.")
+        return pd.DataFrame()
+    return df[valid].reset_index(drop=True)
+
+
+def load_uploaded_file(file):
+    """
+    Fingerprints an uploaded file and routes it to the matching parser.
+
+    Args:
+        file: Uploaded file object (.xlsx, .csv or .parquet).
+
+    Returns:
+        pd.DataFrame: Sales records with the penjualan_bersih columns, or an empty DataFrame
+                      if the file is not recognized.
+    """
+    layout, header_row_idx = fingerprint_sales_file(file)
+    ext = file.name.rsplit('.', 1)[-1].lower()
+
+    if layout == LAYOUT_NOTA:
+        # Read Excel file into a raw DataFrame
+        df_raw = pd.read_excel(file, header=None)
+        return extract_sales_data_dynamic(df_raw, header_row_idx)
+
+    if layout == LAYOUT_BERSIH:
+        try:
+            if ext == 'csv':
+                df_clean = pd.read_csv(file, usecols=CLEAN_COLUMNS)
+            elif ext == 'parquet':
+                df_clean = pd.read_parquet(file, columns=CLEAN_COLUMNS)
+            else:
+                df_clean = pd.read_excel(file, header=header_row_idx, usecols=CLEAN_COLUMNS)
+        except Exception as e:
+            st.error(f"Gagal membaca file '{file.name}'. Terjadi kesalahan: {e}.")
+            return pd.DataFrame()
+        return coerce_clean_schema(df_clean, file.name)
+
+    st.warning(
+        f"Format file '{file.name}' tidak dikenali. Gunakan export nota (header 'TGL NOTA') "
+        f"atau file dengan kolom: {', '.join(CLEAN_COLUMNS)}."
+    )
+    return pd.DataFrame()
+
+# ========================
+# Helper: Name Dictionary (Ingest-time Interning)
+# ========================
+def normalize_name(name, rules):
+    """
+    Applies a normalization rule set to a single name.
+
+    Args:
+        name: Raw name (converted to str).
+        rules (list): (regex, replacement) pairs applied in order.
+
+    Returns:
+        str: Canonical name.
+    """
+    name = str(name)
+    for pattern, replacement in rules:
+        name = re.sub(pattern, replacement, name)
+    return name.strip()
+
+
+def encode_names(values, rules):
+    """
+    Interns a column of names into integer IDs of their canonical form.
+
+    Only the distinct raw spellings are normalized; rows are mapped with vectorized
+    code lookups. IDs follow the sorted order of canonical names, so grouping by ID
+    gives the same order as grouping by name.
+
+    Args:
+        values (pd.Series): Raw names, possibly with missing values.
+        rules (list): (regex, replacement) pairs passed to normalize_name.
+
+    Returns:
+        tuple: (codes, dictionary) where codes is a pd.Series of nullable Int32 IDs aligned
+               with values (<NA> where the name is missing), and dictionary is a pd.DataFrame
+               indexed by 'ID' with the canonical 'Nama' and its raw spellings in 'Alias'.
+    """
+    raw_codes, raw_uniques = pd.factorize(values)
+    canonical = [normalize_name(raw, rules) for raw in raw_uniques]
+    canon_codes, canon_uniques = pd.factorize(pd.Series(canonical, dtype=object), sort=True)
+
+    # raw code -> canonical ID, with -1 (missing) kept as a mask
+    ids = canon_codes[raw_codes] if len(canon_codes) else np.zeros(len(raw_codes), dtype=np.intp)
+    codes = pd.Series(pd.arrays.IntegerArray(ids.astype('int32'), raw_codes < 0), index=values.index)
+
+    aliases = pd.Series([str(raw) for raw in raw_uniques], dtype=object).groupby(canon_codes).agg(lambda s: tuple(sorted(s)))
+    dictionary = pd.DataFrame({'Nama': list(canon_uniques), 'Alias': aliases.reindex(range(len(canon_uniques))).tolist()})
+    dictionary.index.name = 'ID'
+    return codes, dictionary
+
+
 # ========================
 # Helper: Product Categorization
 # ========================
 def categorize_products(product_list):
     """
     Categorizes products based on predefined categories and keywords for 'Rak & Aksesoris Meja'
-    and 'Custom Order'. It strictly uses the provided product names for initial mapping.
+    and 'Custom Order'. Predefined names are normalized with NAME_NORMALIZATION_RULES so they
+    match the canonical names produced at ingest.
 
     Args:
-        product_list (list): A list of product names.
+        product_list (list): A list of canonical product names.
 
     Returns:
         dict: A dictionary mapping product names to their assigned categories.
@@ -436,7 +642,7 @@ def categorize_products(product_list):
     # Populate product_to_category_map from initial_categorization_list
     for category, products in initial_categorization_list.items():
         for product in products:
-            product_to_category_map[product] = category # Use product as is, no strip() here
+            product_to_category_map[normalize_name(product, NAME_NORMALIZATION_RULES['Nama Produk'])] = category
 
     # Process remaining products and apply keyword rules
     for product in product_list:
@@ -465,301 +671,649 @@ def categorize_products(product_list):
 
 
 # ========================
-# Streamlit App Configuration
+# Helper: Per-Category Partial Aggregates
 # ========================
-st.set_page_config(layout="wide", page_title="Dashboard Analisis Penjualan")
+def build_category_partials(df):
+    """
+    Pre-aggregates sales per (Kategori, Bulan) cell so that any category / month selection
+    is answered by combining the selected partials instead of re-filtering raw rows.
+
+    Sums and counts are additive across cells. Distinct customers and products are kept
+    as sets per cell and merged by union, which keeps the distinct counts exact.
+
+    Args:
+        df (pd.DataFrame): Preprocessed sales records with 'Kategori' and 'Bulan' columns.
+
+    Returns:
+        dict: {
+            'ringkasan': pd.DataFrame indexed by (Kategori, Bulan) with 'Total Harga' and 'Transaksi',
+            'produk': pd.DataFrame of 'Jumlah Terjual' / 'Total Harga' sums per
+                      (Kategori, Bulan, Produk_ID, Kota),
+            'harian': pd.DataFrame of row counts and 'Total Harga' sums per
+                      (Kategori, Bulan, Customer_ID, Tanggal_Hari), for repeat-order analysis,
+            'customer': dict mapping (Kategori, Bulan) to a frozenset of customer IDs,
+            'produk_id': dict mapping (Kategori, Bulan) to a frozenset of product IDs
+        }
+    """
+    ringkasan = df.groupby(['Kategori', 'Bulan']).agg(
+        **{'Total Harga': ('Total Harga', 'sum'), 'Transaksi': ('Total Harga', 'size')}
+    )
+
+    # dropna=False keeps rows without a city, so product totals still match the raw rows
+    group_cols = ['Kategori', 'Bulan', 'Produk_ID'] + (['Kota'] if 'Kota' in df.columns else [])
+    produk = df.groupby(group_cols, dropna=False)[['Jumlah Terjual', 'Total Harga']].sum().reset_index()
+
+    # Distinct transaction days per customer stay exact when merging, since days are kept as keys
+    harian = df.groupby(['Kategori', 'Bulan', 'Customer_ID', 'Tanggal_Hari']).agg(
+        **{'Transaksi': ('Total Harga', 'size'), 'Total Harga': ('Total Harga', 'sum')}
+    ).reset_index()
+
+    customer = {key: frozenset(values.dropna()) for key, values in df.groupby(['Kategori', 'Bulan'])['Customer_ID']}
+    produk_id = {key: frozenset(values.dropna()) for key, values in df.groupby(['Kategori', 'Bulan'])['Produk_ID']}
+
+    return {'ringkasan': ringkasan, 'produk': produk, 'harian': harian, 'customer': customer, 'produk_id': produk_id}
+
+
+def combine_category_partials(partials, bulan_range, kategori_filter):
+    """
+    Combines the partials of the selected categories and months.
+
+    Args:
+        partials (dict): Output of build_category_partials.
+        bulan_range (list): Selected months ('YYYY-MM').
+        kategori_filter (list): Selected categories.
+
+    Returns:
+        dict: {
+            'ringkasan': selected (Kategori, Bulan) rows of the summary partial,
+            'produk': selected rows of the product partial,
+            'total_customer': exact number of distinct customers,
+            'total_produk': exact number of distinct products
+        }
+    """
+    ringkasan = partials['ringkasan']
+    ringkasan = ringkasan[
+        ringkasan.index.get_level_values('Kategori').isin(kategori_filter)
+        & ringkasan.index.get_level_values('Bulan').isin(bulan_range)
+    ]
+    produk = partials['produk']
+    produk = produk[produk['Kategori'].isin(kategori_filter) & produk['Bulan'].isin(bulan_range)]
+
+    keys = ringkasan.index.tolist()
+    return {
+        'ringkasan': ringkasan,
+        'produk': produk,
+        'total_customer': len(frozenset().union(*(partials['customer'][key] for key in keys))),
+        'total_produk': len(frozenset().union(*(partials['produk_id'][key] for key in keys)))
+    }
+
+
+def select_customer_days(partials, bulan_range, kategori_filter):
+    """
+    Selects the customer-day partial rows of the selected categories and months.
+
+    Kept out of combine_category_partials because this partial grows with the number of
+    rows; only the Repeat Order view pays for filtering it.
+
+    Args:
+        partials (dict): Output of build_category_partials.
+        bulan_range (list): Selected months ('YYYY-MM').
+        kategori_filter (list): Selected categories.
+
+    Returns:
+        pd.DataFrame: Selected rows of the 'harian' partial.
+    """
+    harian = partials['harian']
+    return harian[harian['Kategori'].isin(kategori_filter) & harian['Bulan'].isin(bulan_range)]
 
-st.sidebar.markdown("📤 **Upload File Penjualan (Excel - bisa banyak file)**")
-uploaded_files = st.sidebar.file_uploader("Unggah file .xlsx", type=['xlsx'], accept_multiple_files=True)
 
 # ========================
-# Load & Combine Data
+# Helper: Analysis Aggregates
 # ========================
-df = pd.DataFrame() # Initialize df as an empty DataFrame
-if uploaded_files:
-    all_data = []
-    for file in uploaded_files:
-        # Read Excel file into a raw DataFrame
-        df_raw = pd.read_excel(file, header=None)
-        df_cleaned = extract_sales_data_dynamic(df_raw)
-        if not df_cleaned.empty:
-            all_data.append(df_cleaned)
-    
-    if all_data:
+def decode_names(df, id_col, names, name_col):
+    """
+    Replaces an ID column with the canonical names from a name dictionary.
+
+    Args:
+        df (pd.DataFrame): Table holding the ID column.
+        id_col (str): Column with IDs from encode_names (e.g. 'Produk_ID').
+        names (pd.Series): The dictionary's 'Nama' column, indexed by ID.
+        name_col (str): Name of the column that takes its place (e.g. 'Nama Produk').
+
+    Returns:
+        pd.DataFrame: Copy of df with name_col at the position of id_col.
+    """
+    df = df.copy()
+    df.insert(df.columns.get_loc(id_col), name_col, df[id_col].map(names).astype(object))
+    return df.drop(columns=id_col)
+
+
+def aggregate_city_pivot(filtered_df, produk_names):
+    """
+    Builds the product x city pivot of units sold.
+
+    Args:
+        filtered_df (pd.DataFrame): Sales records or selected product partials with
+                                    'Produk_ID', 'Kota' and 'Jumlah Terjual'.
+        produk_names (pd.Series): Canonical product names indexed by 'Produk_ID'.
+
+    Returns:
+        pd.DataFrame: Pivot table indexed by 'Nama Produk' with one column per 'Kota'.
+    """
+    sales_by_city = pd.pivot_table(filtered_df, values='Jumlah Terjual', index='Produk_ID', columns='Kota', aggfunc='sum', fill_value=0)
+    sales_by_city.index = pd.Index(sales_by_city.index.map(produk_names), name='Nama Produk')
+    return sales_by_city
+
+
+def classify_abc(filtered_df, produk_names):
+    """
+    Ranks products by revenue and assigns Pareto classes (A <= 80%, B <= 95%, C rest).
+
+    Args:
+        filtered_df (pd.DataFrame): Sales records or selected product partials with
+                                    'Produk_ID' and 'Total Harga'.
+        produk_names (pd.Series): Canonical product names indexed by 'Produk_ID'.
+
+    Returns:
+        tuple: (abc_df, abc_summary) with per-product detail and per-class summary.
+               Both are empty if total revenue is zero.
+    """
+    abc_df = filtered_df.groupby('Produk_ID')['Total Harga'].sum().reset_index()
+    abc_df = decode_names(abc_df, 'Produk_ID', produk_names, 'Nama Produk')
+    abc_df = abc_df.sort_values(by='Total Harga', ascending=False)
+
+    # Handle case where total_harga_sum is zero to avoid division by zero
+    total_harga_sum = abc_df['Total Harga'].sum()
+    if total_harga_sum == 0:
+        return pd.DataFrame(), pd.DataFrame()
+
+    abc_df['Persentase'] = 100 * abc_df['Total Harga'] / total_harga_sum
+    abc_df['Kumulatif'] = abc_df['Persentase'].cumsum()
+
+    def assign_abc(kumulatif):
+        if kumulatif <= 80:
+            return 'A'
+        elif kumulatif <= 95:
+            return 'B'
+        else:
+            return 'C'
+
+    abc_df['Kelas ABC'] = abc_df['Kumulatif'].apply(assign_abc)
+
+    abc_summary = abc_df.groupby('Kelas ABC').agg(
+        Jumlah_Produk=('Nama Produk', 'count'),
+        Total_Penjualan=('Total Harga', 'sum')
+    ).reset_index()
+    abc_summary['Kontribusi (%)'] = 100 * abc_summary['Total_Penjualan'] / total_harga_sum
+
+    return abc_df, abc_summary
+
+
+def summarize_repeat_orders(harian_partials, metode, customer_names):
+    """
+    Summarizes transactions per customer and assigns loyalty classes.
+
+    Args:
+        harian_partials (pd.DataFrame): Selected customer-day partials with 'Customer_ID',
+                                        'Tanggal_Hari', 'Transaksi' and 'Total Harga'.
+        metode (str): "Berdasarkan Hari Unik" to classify by distinct transaction days,
+                      otherwise classify by total transaction rows.
+        customer_names (pd.Series): Canonical customer names indexed by 'Customer_ID'.
+
+    Returns:
+        pd.DataFrame: One row per customer with transaction counts, spend and 'Kelas'.
+    """
+    trx_summary = harian_partials.groupby('Customer_ID').agg(
+        Jumlah_Hari_Transaksi=('Tanggal_Hari', 'nunique'),
+        Jumlah_Total_Transaksi=('Transaksi', 'sum'),
+        Total_Belanja=('Total Harga', 'sum')
+    ).reset_index()
+    trx_summary = decode_names(trx_summary, 'Customer_ID', customer_names, 'Customer')
+
+    def klasifikasi_hari(hari):
+        if hari >= 4:
+            return 'Kelas 1 (Sangat Loyal)'
+        elif hari == 3:
+            return 'Kelas 2 (Loyal)'
+        elif hari == 2:
+            return 'Kelas 3 (Potensial Loyal)'
+        else:
+            return 'Kelas 4 (Baru)'
+
+    def klasifikasi_total(trx):
+        if trx >= 4:
+            return 'Kelas 1 (Sangat Loyal)'
+        elif trx == 3:
+            return 'Kelas 2 (Loyal)'
+        elif trx == 2:
+            return 'Kelas 3 (Potensial Loyal)'
+        else:
+            return 'Kelas 4 (Baru)'
+
+    trx_summary['Kelas'] = trx_summary['Jumlah_Hari_Transaksi'].apply(klasifikasi_hari) if metode == "Berdasarkan Hari Unik" else trx_summary['Jumlah_Total_Transaksi'].apply(klasifikasi_total)
+    return trx_summary
+
+
+# ========================
+# Helper: Streaming Export (CSV / XLSX)
+# ========================
+def iter_csv_chunks(df, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Serializes a DataFrame to CSV one block of rows at a time.
+
+    Args:
+        df (pd.DataFrame): Table to export. The index is not written.
+        chunk_rows (int): Number of rows encoded per yielded chunk.
+
+    Yields:
+        bytes: UTF-8 encoded CSV text, header first, then row blocks.
+    """
+    yield df.iloc[0:0].to_csv(index=False).encode('utf-8')
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode('utf-8')
+
+
+def write_xlsx_streaming(sheets, target, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Writes one or more DataFrames to an XLSX workbook using openpyxl's write-only mode,
+    so rows are flushed to the target as they are appended instead of kept in memory.
+
+    Args:
+        sheets (dict): Mapping of sheet name to pd.DataFrame (index is not written).
+        target: Path or binary file object to save the workbook into.
+        chunk_rows (int): Number of rows converted to Python tuples per step.
+    """
+    wb = Workbook(write_only=True)
+    for sheet_name, df in sheets.items():
+        ws = wb.create_sheet(title=str(sheet_name)[:31]) # Excel limits sheet names to 31 chars
+        ws.append([str(col) for col in df.columns])
+        for start in range(0, len(df), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].astype(object).where(lambda c: c.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                ws.append(list(row))
+    wb.save(target)
+
+
+def _spool_export(writer):
+    """
+    Runs an export writer against a temporary file on disk and returns the finished bytes.
+
+    Used as the deferred callable behind st.download_button, so the file is only
+    produced when the user clicks the button. Rows go to disk while writing, but
+    Streamlit keeps the whole payload in its media store to serve it, so memory per
+    download grows with the size of the exported file.
+
+    Args:
+        writer (callable): Function taking a writable binary file object.
+
+    Returns:
+        bytes: Content of the exported file.
+    """
+    with tempfile.TemporaryFile() as spool:
+        writer(spool)
+        spool.seek(0)
+        return spool.read()
+
+
+def _write_csv(df, out):
+    for chunk in iter_csv_chunks(df):
+        out.write(chunk)
+
+
+def render_export_buttons(file_stem, csv_df, sheets=None):
+    """
+    Renders CSV and XLSX download buttons for an analysis result.
+
+    Args:
+        file_stem (str): Base file name (without extension) and widget key prefix.
+        csv_df (pd.DataFrame): Table exported to CSV.
+        sheets (dict, optional): Sheets exported to XLSX. Defaults to csv_df alone.
+    """
+    if sheets is None:
+        sheets = {'Data': csv_df}
+
+    col_csv, col_xlsx = st.columns(2)
+    col_csv.download_button(
+        "⬇️ Unduh CSV",
+        data=partial(_spool_export, partial(_write_csv, csv_df)),
+        file_name=f"{file_stem}.csv",
+        mime="text/csv",
+        key=f"export_csv_{file_stem}",
+        on_click="ignore" # Downloading must not rerun the dashboard
+    )
+    col_xlsx.download_button(
+        "⬇️ Unduh Excel",
+        data=partial(_spool_export, partial(write_xlsx_streaming, sheets)),
+        file_name=f"{file_stem}.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"export_xlsx_{file_stem}",
+        on_click="ignore"
+    )
+
+
+# ========================
+# Helper: Cached Load & Preprocess
+# ========================
+@st.cache_resource(show_spinner="Memproses data penjualan...", max_entries=SALES_CACHE_MAX_ENTRIES, ttl=SALES_CACHE_TTL)
+def prepare_sales_data(uploaded_files, default_path, default_mtime):
+    """
+    Loads, cleans, encodes and categorizes the sales data, then builds the partial aggregates.
+
+    Cached on the upload contents (or the default file path and modification time), so
+    reruns triggered by filter or menu changes only combine the cached partials. The cache
+    is a resource cache: every rerun and session gets the same objects instead of an
+    unpickled copy, so callers must treat the result as read-only.
+
+    Args:
+        uploaded_files (list): Uploaded files; the default CSV is used when empty.
+        default_path (str): Path of the default penjualan_bersih.csv.
+        default_mtime (float): Modification time of default_path (None if missing); part of the cache key.
+
+    Returns:
+        dict: {'partials', 'produk_dict', 'customer_dict', 'bulan_list', 'has_kota'}, or None if
+              there is no data to analyze (the reason is shown as a message).
+    """
+    if uploaded_files:
+        all_data = []
+        for file in uploaded_files:
+            # Check the layout from the first rows, then parse with the matching reader
+            df_cleaned = load_uploaded_file(file)
+            if not df_cleaned.empty:
+                all_data.append(df_cleaned)
+
+        if not all_data:
+            st.warning("Tidak ada data yang berhasil diekstrak dari file yang diunggah. Pastikan format file benar.")
+            return None
         df = pd.concat(all_data, ignore_index=True)
     else:
-        st.warning("Tidak ada data yang berhasil diekstrak dari file yang diunggah. Pastikan format file benar.")
-        st.stop()
-else:
-    # Use default data if no files are uploaded
-    try:
-        # Ensure 'Nama Produk' is read correctly and doesn't get stripped if it has leading/trailing spaces
-        df = pd.read_csv("penjualan_bersih.csv") 
-    except FileNotFoundError:
-        st.error("File 'penjualan_bersih.csv' tidak ditemukan. Harap unggah file Excel atau pastikan file default ada.")
-        st.stop()
-
-# --- Data Cleaning and Preprocessing ---
-if not df.empty:
-    # Filter out "Padma Utama" from the DataFrame
-    if 'Customer' in df.columns:
-        # Convert to string and lower for robust comparison
-        df = df[df['Customer'].astype(str).str.lower() != 'padma utama jadi cv']
+        # Use default data if no files are uploaded
+        try:
+            df = coerce_clean_schema(pd.read_csv(default_path), os.path.basename(default_path))
+        except FileNotFoundError:
+            st.error("File 'penjualan_bersih.csv' tidak ditemukan. Harap unggah file penjualan atau pastikan file default ada.")
+            return None
         if df.empty:
-            st.warning("Setelah memfilter 'Padma Utama', tidak ada data yang tersisa untuk dianalisis.")
-            st.stop()
-    
+            st.info("Unggah file penjualan (Excel, CSV atau Parquet) untuk memulai analisis penjualan.")
+            return None
+
+    # --- Data Cleaning and Preprocessing ---
     # Ensure 'Tanggal' column is datetime
     df['Tanggal'] = pd.to_datetime(df['Tanggal'])
-    df['Tanggal_Hari'] = df['Tanggal'].dt.date
+    df['Tanggal_Hari'] = df['Tanggal'].dt.normalize() # Day-level date for the repeat-order partial
     # Ensure 'Bulan' column is in 'YYYY-MM' format for consistent sorting and filtering
     df['Bulan'] = df['Tanggal'].dt.to_period('M').astype(str)
 
-    # Apply Product Categorization
-    # Get unique product names exactly as they appear in the DataFrame
-    all_unique_products = df['Nama Produk'].unique().tolist()
-    product_to_category_map = categorize_products(all_unique_products)
+    # Intern product and customer names: downstream grouping works on integer IDs,
+    # names are looked up in the dictionaries only for display
+    df['Produk_ID'], produk_dict = encode_names(df['Nama Produk'], NAME_NORMALIZATION_RULES['Nama Produk'])
+    df['Customer_ID'], customer_dict = encode_names(df['Customer'], NAME_NORMALIZATION_RULES['Customer'])
+    df = df.drop(columns=['Nama Produk', 'Customer'])
+    produk_names = produk_dict['Nama']
+    customer_names = customer_dict['Nama']
+
+    # Filter out "Padma Utama" on the canonical names, so spelling variants are excluded too
+    padma_ids = customer_names.index[customer_names.str.lower() == normalize_name('padma utama jadi cv', NAME_NORMALIZATION_RULES['Customer'])]
+    df = df[~df['Customer_ID'].isin(padma_ids)]
+    # Drop them from the dictionary too, so their aliases are not listed for an excluded customer
+    customer_dict = customer_dict.drop(index=padma_ids)
+    if df.empty:
+        st.warning("Setelah memfilter 'Padma Utama', tidak ada data yang tersisa untuk dianalisis.")
+        return None
+
+    # Apply Product Categorization once per canonical product, then broadcast by ID
+    product_to_category_map = categorize_products(produk_names.tolist())
+    kategori_by_id = produk_names.map(product_to_category_map)
     
     # Apply mapping, if a product is not found, it will be 'Uncategorized'
-    df['Kategori'] = df['Nama Produk'].map(product_to_category_map).fillna('Uncategorized')
+    df['Kategori'] = df['Produk_ID'].map(kategori_by_id).fillna('Uncategorized')
+
+    # Only the aggregates are returned, so the cache never holds the row-level data
+    partials = build_category_partials(df)
+    return {
+        'partials': partials,
+        'produk_dict': produk_dict,
+        'customer_dict': customer_dict,
+        'bulan_list': sorted(partials['ringkasan'].index.get_level_values('Bulan').unique()),
+        'has_kota': 'Kota' in df.columns
+    }
+
+
+# ========================
+# Streamlit App Configuration
+# ========================
+st.set_page_config(layout="wide", page_title="Dashboard Analisis Penjualan")
+
+st.sidebar.markdown("📤 **Upload File Penjualan (Excel / CSV / Parquet - bisa banyak file)**")
+uploaded_files = st.sidebar.file_uploader("Unggah file .xlsx, .csv atau .parquet", type=['xlsx', 'csv', 'parquet'], accept_multiple_files=True)
+
+# ========================
+# Load & Combine Data
+# ========================
+default_mtime = os.path.getmtime(DEFAULT_DATA_PATH) if os.path.exists(DEFAULT_DATA_PATH) else None
+sales_data = prepare_sales_data(uploaded_files or [], DEFAULT_DATA_PATH, default_mtime)
+if sales_data is None:
+    st.stop()
+
+partials = sales_data['partials']
+produk_dict = sales_data['produk_dict']
+customer_dict = sales_data['customer_dict']
+produk_names = produk_dict['Nama']
+customer_names = customer_dict['Nama']
 
 # ========================
 # Sidebar: Global Filters
 # ========================
-if not df.empty:
-    bulan_list = sorted(df['Bulan'].unique())
-    # Set default index for selectbox more safely
-    default_bulan_sampai_index = len(bulan_list) - 1 if bulan_list else 0
+bulan_list = sales_data['bulan_list']
+# Set default index for selectbox more safely
+default_bulan_sampai_index = len(bulan_list) - 1 if bulan_list else 0
 
-    bulan_dari = st.sidebar.selectbox("📆 Bulan Mulai", bulan_list, index=0)
-    bulan_sampai = st.sidebar.selectbox("📆 Bulan Sampai", bulan_list, index=default_bulan_sampai_index)
+bulan_dari = st.sidebar.selectbox("📆 Bulan Mulai", bulan_list, index=0)
+bulan_sampai = st.sidebar.selectbox("📆 Bulan Sampai", bulan_list, index=default_bulan_sampai_index)
 
-    # Ensure bulan_dari is not after bulan_sampai
-    if bulan_list.index(bulan_dari) > bulan_list.index(bulan_sampai):
-        st.sidebar.error("Bulan Mulai tidak boleh setelah Bulan Sampai. Harap sesuaikan.")
-        st.stop()
+# Ensure bulan_dari is not after bulan_sampai
+if bulan_list.index(bulan_dari) > bulan_list.index(bulan_sampai):
+    st.sidebar.error("Bulan Mulai tidak boleh setelah Bulan Sampai. Harap sesuaikan.")
+    st.stop()
 
-    # Filter by selected month range
-    bulan_range = bulan_list[bulan_list.index(bulan_dari):bulan_list.index(bulan_sampai) + 1]
-    filtered_df = df[df['Bulan'].isin(bulan_range)].copy() # Use .copy() to avoid SettingWithCopyWarning
+# Filter by selected month range
+bulan_range = bulan_list[bulan_list.index(bulan_dari):bulan_list.index(bulan_sampai) + 1]
 
-    # Filter by product category (only show categories present in the filtered data)
-    available_categories = sorted(filtered_df['Kategori'].unique())
-    kategori_filter = st.sidebar.multiselect(
-        "📂 Kategori Produk",
-        options=available_categories,
-        default=available_categories # Select all by default
-    )
+# Aggregates are kept per (Kategori, Bulan); filter changes only combine the selected partials
+
+# Filter by product category (only show categories present in the filtered data)
+bulan_partials = partials['ringkasan'][partials['ringkasan'].index.get_level_values('Bulan').isin(bulan_range)]
+available_categories = sorted(bulan_partials.index.get_level_values('Kategori').unique())
+kategori_filter = st.sidebar.multiselect(
+    "📂 Kategori Produk",
+    options=available_categories,
+    default=available_categories # Select all by default
+)
+
+selected = combine_category_partials(partials, bulan_range, kategori_filter)
+produk_partials = selected['produk']
+
+if selected['ringkasan'].empty:
+    st.warning("Tidak ada data yang cocok dengan filter yang dipilih. Harap sesuaikan filter.")
+    st.stop()
+
+# ========================
+# KPI Summary
+# ========================
+with st.expander("📊 Ringkasan Kinerja (KPI)"):
+    total_penjualan = selected['ringkasan']['Total Harga'].sum()
+    total_transaksi = selected['ringkasan']['Transaksi'].sum()
+    total_customer = selected['total_customer']
+    total_produk = selected['total_produk']
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("💰 Total Penjualan", f"Rp {total_penjualan:,.0f}".replace(",", "."))
+    col2.metric("🛒 Total Transaksi", total_transaksi)
+    col3.metric("👥 Customer Unik", total_customer)
+    col4.metric("📦 Produk Terjual", total_produk)
+
+# Show which raw spellings were merged into one canonical name at ingest
+alias_dicts = {'Produk': produk_dict, 'Customer': customer_dict}
+merged_aliases = {label: d[d['Alias'].str.len() > 1] for label, d in alias_dicts.items()}
+if any(not merged.empty for merged in merged_aliases.values()):
+    with st.expander("🔤 Normalisasi Nama (Alias)"):
+        for label, merged in merged_aliases.items():
+            if not merged.empty:
+                st.markdown(f"**{label}** — {len(merged)} nama digabung")
+                st.dataframe(merged.assign(Alias=merged['Alias'].str.join(' | ')), use_container_width=True)
+
+# ========================
+# Analysis Menu Options
+# ========================
+st.title("📈 Dashboard Analisis Penjualan")
+menu = st.selectbox(
+    "📌 Pilih Jenis Analisis:",
+    [
+        "Top 3 Produk Terlaris",
+        "Top 3 Produk Terendah",
+        "Produk Deadstock",
+        "Segmentasi Wilayah",
+        "Tren Penjualan Bulanan",
+        "Klasifikasi ABC",
+        "Repeat Order Pelanggan"
+    ]
+)
+
+# ========================
+# Analysis based on menu selection
+# ========================
+
+# 1. Top Produk Terlaris
+if menu == "Top 3 Produk Terlaris":
+    st.header("🏆 Top 3 Produk Terlaris per Kategori")
+    # Ensure 'Jumlah Terjual' is numeric
+    top_products = produk_partials.groupby(['Kategori', 'Produk_ID'])['Jumlah Terjual'].sum().reset_index()
+    top_products = decode_names(top_products, 'Produk_ID', produk_names, 'Nama Produk')
+    top3 = top_products.sort_values(['Kategori', 'Jumlah Terjual'], ascending=[True, False]).groupby('Kategori').head(3)
+    st.dataframe(top3, use_container_width=True)
+    render_export_buttons("top3_produk_terlaris", top3)
+
+# 2. Top Produk Terendah
+elif menu == "Top 3 Produk Terendah":
+    st.header("⬇️ Top 3 Produk Penjualan Terendah per Kategori")
+    # Ensure 'Jumlah Terjual' is numeric
+    low_products = produk_partials.groupby(['Kategori', 'Produk_ID'])['Jumlah Terjual'].sum().reset_index()
+    low_products = decode_names(low_products, 'Produk_ID', produk_names, 'Nama Produk')
+    low3 = low_products.sort_values(['Kategori', 'Jumlah Terjual'], ascending=[True, True]).groupby('Kategori').head(3)
+    st.dataframe(low3, use_container_width=True)
+    render_export_buttons("top3_produk_terendah", low3)
+
+# 3. Produk Deadstock - Disesuaikan untuk menyertakan produk dengan penjualan 0
+elif menu == "Produk Deadstock":
+    st.header("📦 Produk Deadstock (Jumlah Terjual ≤ 10)")
+    
+    # 1. Get the complete list of products from the categorization map
+    #    We call the function with an empty list, as it contains all predefined products
+    all_categorized_products = categorize_products([])
+    df_all_products = pd.DataFrame(all_categorized_products.items(), columns=['Nama Produk', 'Kategori'])
+    #    Products never seen in the data have no ID (<NA>)
+    produk_id_by_name = pd.Series(produk_names.index, index=produk_names.values)
+    df_all_products['Produk_ID'] = df_all_products['Nama Produk'].map(produk_id_by_name).astype('Int32')
+
+    # 2. Calculate sum of sales for each product from the selected partials
+    sales_summary = produk_partials.groupby('Produk_ID')['Jumlah Terjual'].sum().reset_index()
+
+    # 3. Merge the complete product list with the sales summary using a left join
+    #    This ensures all products from the master list are included.
+    deadstock_df = pd.merge(df_all_products, sales_summary, on='Produk_ID', how='left').drop(columns='Produk_ID')
+
+    # 4. Fill NaN values (products with 0 sales) with 0 and convert to integer
+    deadstock_df['Jumlah Terjual'] = deadstock_df['Jumlah Terjual'].fillna(0).astype(int)
+
+    # 5. Filter for products with sales <= 10
+    final_deadstock = deadstock_df[deadstock_df['Jumlah Terjual'] <= 10]
     
-    filtered_df = filtered_df[filtered_df['Kategori'].isin(kategori_filter)]
+    if not final_deadstock.empty:
+        final_deadstock = final_deadstock.sort_values(['Kategori', 'Jumlah Terjual'], ascending=[True, True])
+        st.dataframe(final_deadstock, use_container_width=True)
+        render_export_buttons("produk_deadstock", final_deadstock)
+    else:
+        st.info("Tidak ada produk deadstock yang ditemukan berdasarkan kriteria (Jumlah Terjual <= 10).")
+
+# 4. Segmentasi Wilayah
+elif menu == "Segmentasi Wilayah":
+    st.header("🌍 Segmentasi Penjualan Berdasarkan Kota")
+    if sales_data['has_kota']:
+        sales_by_city = aggregate_city_pivot(produk_partials, produk_names)
+        st.dataframe(sales_by_city, use_container_width=True)
+        render_export_buttons("segmentasi_wilayah", sales_by_city.reset_index())
+    else:
+        st.warning("Kolom 'Kota' tidak ditemukan dalam data. Pastikan data memiliki informasi kota.")
+
+# 5. Tren Penjualan Bulanan
+elif menu == "Tren Penjualan Bulanan":
+    st.header("📆 Tren Penjualan Bulanan")
+    monthly_sales = selected['ringkasan'].groupby('Bulan')['Total Harga'].sum().reset_index()
+    # Ensure correct sorting of months
+    monthly_sales['Bulan_Sort'] = pd.to_datetime(monthly_sales['Bulan'])
+    monthly_sales = monthly_sales.sort_values('Bulan_Sort').drop('Bulan_Sort', axis=1)
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(monthly_sales['Bulan'], monthly_sales['Total Harga'], marker='o', linestyle='-', color='skyblue')
+    ax.set_title('Tren Penjualan Bulanan', fontsize=16)
+    ax.set_xlabel('Bulan', fontsize=12)
+    ax.set_ylabel('Total Penjualan (Rp)', fontsize=12)
+    plt.xticks(rotation=45, ha='right')
+    plt.grid(True, linestyle='--', alpha=0.6)
+    plt.tight_layout() # Adjust layout to prevent labels from overlapping
+    st.pyplot(fig)
+    render_export_buttons("tren_penjualan_bulanan", monthly_sales)
 
-    if filtered_df.empty:
-        st.warning("Tidak ada data yang cocok dengan filter yang dipilih. Harap sesuaikan filter.")
+# 6. Klasifikasi ABC
+elif menu == "Klasifikasi ABC":
+    st.header("🏷️ Klasifikasi ABC (Pareto 80/15/5)")
+    abc_df, abc_summary = classify_abc(produk_partials, produk_names)
+    if abc_df.empty:
+        st.warning("Total penjualan adalah nol, tidak dapat melakukan klasifikasi ABC.")
         st.stop()
 
-    # ========================
-    # KPI Summary
-    # ========================
-    with st.expander("📊 Ringkasan Kinerja (KPI)"):
-        total_penjualan = filtered_df['Total Harga'].sum()
-        total_transaksi = filtered_df.shape[0]
-        total_customer = filtered_df['Customer'].nunique()
-        total_produk = filtered_df['Nama Produk'].nunique()
-
-        col1, col2, col3, col4 = st.columns(4)
-        col1.metric("💰 Total Penjualan", f"Rp {total_penjualan:,.0f}".replace(",", "."))
-        col2.metric("🛒 Total Transaksi", total_transaksi)
-        col3.metric("👥 Customer Unik", total_customer)
-        col4.metric("📦 Produk Terjual", total_produk)
-
-    # ========================
-    # Analysis Menu Options
-    # ========================
-    st.title("📈 Dashboard Analisis Penjualan")
-    menu = st.selectbox(
-        "📌 Pilih Jenis Analisis:",
-        [
-            "Top 3 Produk Terlaris",
-            "Top 3 Produk Terendah",
-            "Produk Deadstock",
-            "Segmentasi Wilayah",
-            "Tren Penjualan Bulanan",
-            "Klasifikasi ABC",
-            "Repeat Order Pelanggan"
-        ]
-    )
+    st.subheader("📈 Ringkasan Jumlah Produk & Kontribusi")
+    st.dataframe(abc_summary.round(2), use_container_width=True) # Round for better display
 
-    # ========================
-    # Analysis based on menu selection
-    # ========================
-
-    # 1. Top Produk Terlaris
-    if menu == "Top 3 Produk Terlaris":
-        st.header("🏆 Top 3 Produk Terlaris per Kategori")
-        # Ensure 'Jumlah Terjual' is numeric
-        top_products = filtered_df.groupby(['Kategori', 'Nama Produk'])['Jumlah Terjual'].sum().reset_index()
-        top3 = top_products.sort_values(['Kategori', 'Jumlah Terjual'], ascending=[True, False]).groupby('Kategori').head(3)
-        st.dataframe(top3, use_container_width=True)
-
-    # 2. Top Produk Terendah
-    elif menu == "Top 3 Produk Terendah":
-        st.header("⬇️ Top 3 Produk Penjualan Terendah per Kategori")
-        # Ensure 'Jumlah Terjual' is numeric
-        low_products = filtered_df.groupby(['Kategori', 'Nama Produk'])['Jumlah Terjual'].sum().reset_index()
-        low3 = low_products.sort_values(['Kategori', 'Jumlah Terjual'], ascending=[True, True]).groupby('Kategori').head(3)
-        st.dataframe(low3, use_container_width=True)
-
-    # 3. Produk Deadstock - Disesuaikan untuk menyertakan produk dengan penjualan 0
-    elif menu == "Produk Deadstock":
-        st.header("📦 Produk Deadstock (Jumlah Terjual ≤ 10)")
-        
-        # 1. Get the complete list of products from the categorization map
-        #    We call the function with an empty list, as it contains all predefined products
-        all_categorized_products = categorize_products([])
-        df_all_products = pd.DataFrame(all_categorized_products.items(), columns=['Nama Produk', 'Kategori'])
+    st.subheader("📋 Detail Produk per Kelas ABC")
+    kelas_order_abc = ['A', 'B', 'C'] # Define explicit order
+    abc_sheets = {'Ringkasan': abc_summary}
+    for kelas in kelas_order_abc:
+        kelas_df = abc_df[abc_df['Kelas ABC'] == kelas][['Nama Produk', 'Total Harga', 'Persentase', 'Kumulatif']]
+        st.markdown(f"**Kelas {kelas}** — {len(kelas_df)} Produk")
+        st.dataframe(kelas_df.round(2), use_container_width=True)
+        abc_sheets[f'Kelas {kelas}'] = kelas_df
 
-        # 2. Calculate sum of sales for each product from the filtered data
-        sales_summary = filtered_df.groupby('Nama Produk')['Jumlah Terjual'].sum().reset_index()
+    render_export_buttons("klasifikasi_abc", abc_df, abc_sheets)
 
-        # 3. Merge the complete product list with the sales summary using a left join
-        #    This ensures all products from the master list are included.
-        deadstock_df = pd.merge(df_all_products, sales_summary, on='Nama Produk', how='left')
+# 7. Repeat Order Pelanggan
+elif menu == "Repeat Order Pelanggan":
+    st.header("🔁 Repeat Order Pelanggan")
+    
+    metode = st.radio(
+        "📌 Metode Analisis Loyalitas",
+        ["Berdasarkan Hari Unik", "Berdasarkan Total Transaksi"],
+        horizontal=True
+    )
 
-        # 4. Fill NaN values (products with 0 sales) with 0 and convert to integer
-        deadstock_df['Jumlah Terjual'] = deadstock_df['Jumlah Terjual'].fillna(0).astype(int)
+    trx_summary = summarize_repeat_orders(select_customer_days(partials, bulan_range, kategori_filter), metode, customer_names)
 
-        # 5. Filter for products with sales <= 10
-        final_deadstock = deadstock_df[deadstock_df['Jumlah Terjual'] <= 10]
-        
-        if not final_deadstock.empty:
-            st.dataframe(final_deadstock.sort_values(['Kategori', 'Jumlah Terjual'], ascending=[True, True]), use_container_width=True)
-        else:
-            st.info("Tidak ada produk deadstock yang ditemukan berdasarkan kriteria (Jumlah Terjual <= 10).")
-
-    # 4. Segmentasi Wilayah
-    elif menu == "Segmentasi Wilayah":
-        st.header("🌍 Segmentasi Penjualan Berdasarkan Kota")
-        if 'Kota' in filtered_df.columns:
-            sales_by_city = pd.pivot_table(filtered_df, values='Jumlah Terjual', index='Nama Produk', columns='Kota', aggfunc='sum', fill_value=0)
-            st.dataframe(sales_by_city, use_container_width=True)
-        else:
-            st.warning("Kolom 'Kota' tidak ditemukan dalam data. Pastikan data memiliki informasi kota.")
-
-    # 5. Tren Penjualan Bulanan
-    elif menu == "Tren Penjualan Bulanan":
-        st.header("📆 Tren Penjualan Bulanan")
-        monthly_sales = filtered_df.groupby('Bulan')['Total Harga'].sum().reset_index()
-        # Ensure correct sorting of months
-        monthly_sales['Bulan_Sort'] = pd.to_datetime(monthly_sales['Bulan'])
-        monthly_sales = monthly_sales.sort_values('Bulan_Sort').drop('Bulan_Sort', axis=1)
-
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.plot(monthly_sales['Bulan'], monthly_sales['Total Harga'], marker='o', linestyle='-', color='skyblue')
-        ax.set_title('Tren Penjualan Bulanan', fontsize=16)
-        ax.set_xlabel('Bulan', fontsize=12)
-        ax.set_ylabel('Total Penjualan (Rp)', fontsize=12)
-        plt.xticks(rotation=45, ha='right')
-        plt.grid(True, linestyle='--', alpha=0.6)
-        plt.tight_layout() # Adjust layout to prevent labels from overlapping
-        st.pyplot(fig)
-
-    # 6. Klasifikasi ABC
-    elif menu == "Klasifikasi ABC":
-        st.header("🏷️ Klasifikasi ABC (Pareto 80/15/5)")
-        abc_df = filtered_df.groupby('Nama Produk')['Total Harga'].sum().reset_index()
-        abc_df = abc_df.sort_values(by='Total Harga', ascending=False)
-        
-        # Handle case where total_harga_sum is zero to avoid division by zero
-        total_harga_sum = abc_df['Total Harga'].sum()
-        if total_harga_sum == 0:
-            st.warning("Total penjualan adalah nol, tidak dapat melakukan klasifikasi ABC.")
-            st.stop()
-
-        abc_df['Persentase'] = 100 * abc_df['Total Harga'] / total_harga_sum
-        abc_df['Kumulatif'] = abc_df['Persentase'].cumsum()
-
-        def assign_abc(kumulatif):
-            if kumulatif <= 80:
-                return 'A'
-            elif kumulatif <= 95:
-                return 'B'
-            else:
-                return 'C'
+    st.subheader("📈 Ringkasan Jumlah Customer per Kelas")
+    ringkasan = trx_summary.groupby('Kelas')['Customer'].count().reset_index(name='Jumlah Customer')
+    # Ensure consistent order for display
+    kelas_order = ['Kelas 1 (Sangat Loyal)', 'Kelas 2 (Loyal)', 'Kelas 3 (Potensial Loyal)', 'Kelas 4 (Baru)']
+    ringkasan['Kelas'] = pd.Categorical(ringkasan['Kelas'], categories=kelas_order, ordered=True)
+    ringkasan = ringkasan.sort_values('Kelas')
+    st.dataframe(ringkasan, use_container_width=True)
 
-        abc_df['Kelas ABC'] = abc_df['Kumulatif'].apply(assign_abc)
+    st.subheader("📋 Daftar Customer per Kelas")
+    for kelas in kelas_order:
+        data_kelas = trx_summary[trx_summary['Kelas'] == kelas]
+        if not data_kelas.empty:
+            daftar_customer = '; '.join(sorted(data_kelas['Customer'].tolist()))
+            st.markdown(f"**{kelas}** — {len(data_kelas)} customer")
+            st.code(daftar_customer, language='text')
+        else:
+            st.markdown(f"**{kelas}** — Tidak ada customer")
 
-        st.subheader("📈 Ringkasan Jumlah Produk & Kontribusi")
-        abc_summary = abc_df.groupby('Kelas ABC').agg(
-            Jumlah_Produk=('Nama Produk', 'count'),
-            Total_Penjualan=('Total Harga', 'sum')
-        ).reset_index()
-        
-        abc_summary['Kontribusi (%)'] = 100 * abc_summary['Total_Penjualan'] / total_harga_sum
-        st.dataframe(abc_summary.round(2), use_container_width=True) # Round for better display
-
-        st.subheader("📋 Detail Produk per Kelas ABC")
-        kelas_order_abc = ['A', 'B', 'C'] # Define explicit order
-        for kelas in kelas_order_abc:
-            kelas_df = abc_df[abc_df['Kelas ABC'] == kelas]
-            st.markdown(f"**Kelas {kelas}** — {len(kelas_df)} Produk")
-            st.dataframe(kelas_df[['Nama Produk', 'Total Harga', 'Persentase', 'Kumulatif']].round(2), use_container_width=True)
-
-    # 7. Repeat Order Pelanggan
-    elif menu == "Repeat Order Pelanggan":
-        st.header("🔁 Repeat Order Pelanggan")
-        # Use filtered_df directly as it already applies month range
-        repeat_df = filtered_df.copy() 
-        
-        metode = st.radio(
-            "📌 Metode Analisis Loyalitas",
-            ["Berdasarkan Hari Unik", "Berdasarkan Total Transaksi"],
-            horizontal=True
-        )
-
-        trx_summary = repeat_df.groupby('Customer').agg(
-            Jumlah_Hari_Transaksi=('Tanggal_Hari', 'nunique'),
-            Jumlah_Total_Transaksi=('Tanggal', 'count'),
-            Total_Belanja=('Total Harga', 'sum')
-        ).reset_index()
-
-        def klasifikasi_hari(hari):
-            if hari >= 4:
-                return 'Kelas 1 (Sangat Loyal)'
-            elif hari == 3:
-                return 'Kelas 2 (Loyal)'
-            elif hari == 2:
-                return 'Kelas 3 (Potensial Loyal)'
-            else:
-                return 'Kelas 4 (Baru)'
-
-        def klasifikasi_total(trx):
-            if trx >= 4:
-                return 'Kelas 1 (Sangat Loyal)'
-            elif trx == 3:
-                return 'Kelas 2 (Loyal)'
-            elif trx == 2:
-                return 'Kelas 3 (Potensial Loyal)'
-            else:
-                return 'Kelas 4 (Baru)'
-
-        trx_summary['Kelas'] = trx_summary['Jumlah_Hari_Transaksi'].apply(klasifikasi_hari) if metode == "Berdasarkan Hari Unik" else trx_summary['Jumlah_Total_Transaksi'].apply(klasifikasi_total)
-
-        st.subheader("📈 Ringkasan Jumlah Customer per Kelas")
-        ringkasan = trx_summary.groupby('Kelas')['Customer'].count().reset_index(name='Jumlah Customer')
-        # Ensure consistent order for display
-        kelas_order = ['Kelas 1 (Sangat Loyal)', 'Kelas 2 (Loyal)', 'Kelas 3 (Potensial Loyal)', 'Kelas 4 (Baru)']
-        ringkasan['Kelas'] = pd.Categorical(ringkasan['Kelas'], categories=kelas_order, ordered=True)
-        ringkasan = ringkasan.sort_values('Kelas')
-        st.dataframe(ringkasan, use_container_width=True)
-
-        st.subheader("📋 Daftar Customer per Kelas")
-        for kelas in kelas_order:
-            data_kelas = trx_summary[trx_summary['Kelas'] == kelas]
-            if not data_kelas.empty:
-                daftar_customer = '; '.join(sorted(data_kelas['Customer'].tolist()))
-                st.markdown(f"**{kelas}** — {len(data_kelas)} customer")
-                st.code(daftar_customer, language='text')
-            else:
-                st.markdown(f"**{kelas}** — Tidak ada customer")
-else:
-    st.info("Unggah file Excel untuk memulai analisis penjualan.")
+    trx_export = trx_summary.sort_values(['Kelas', 'Customer'])
+    render_export_buttons("repeat_order_pelanggan", trx_export, {'Ringkasan': ringkasan, 'Daftar Customer': trx_export})
@@ -0,0 +1,484 @@
+"""
+Load-test harness for the sales dashboard (app.py).
+
+Drives the app script headlessly through Streamlit's AppTest and simulates N
+concurrent dashboard sessions. Each session uploads synthetic sales files, changes
+the month range, toggles product categories and switches through all seven
+analyses. The report lists latency percentiles per interaction and peak memory
+per session, for each data scale.
+
+Usage:
+    python loadtest.py --sessions 4 --scales 5000 50000 --rounds 2
+
+Isolation modes:
+    process  one OS process per session (default). Peak RSS is per session, but
+             sessions do not share st.cache_data entries.
+    thread   all sessions in one process, like a single Streamlit server. Caches and
+             the GIL are shared; memory is only reported for the whole process.
+"""
+import argparse
+import io
+import json
+import multiprocessing as mp
+import os
+import queue as queue_module
+import random
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+try:
+    import resource # Not available on Windows; peak RSS is then not reported
+except ImportError:
+    resource = None
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "penjualan_bersih.csv")
+
+MENU_OPTIONS = [
+    "Top 3 Produk Terlaris",
+    "Top 3 Produk Terendah",
+    "Produk Deadstock",
+    "Segmentasi Wilayah",
+    "Tren Penjualan Bulanan",
+    "Klasifikasi ABC",
+    "Repeat Order Pelanggan"
+]
+METODE_OPTIONS = ["Berdasarkan Hari Unik", "Berdasarkan Total Transaksi"]
+UPLOAD_FORMATS = ['csv', 'parquet', 'xlsx', 'nota']
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/octet-stream',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'nota': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+RESULT_POLL_SECONDS = 5 # How often the parent checks for dead workers while waiting for results
+WORKER_STARTUP_SECONDS = 120 # Spawn + import allowance per worker on top of the rerun timeouts
+
+
+# ========================
+# Synthetic Data
+# ========================
+def load_vocabulary(path=DEFAULT_DATA_PATH):
+    """
+    Collects product, customer and city names to draw synthetic rows from.
+
+    Args:
+        path (str): CSV in the penjualan_bersih schema. Generated names are used if missing.
+
+    Returns:
+        dict: {'Nama Produk': list, 'Customer': list, 'Kota': list}
+    """
+    try:
+        df = pd.read_csv(path)
+        return {col: df[col].dropna().unique().tolist() for col in ['Nama Produk', 'Customer', 'Kota']}
+    except (FileNotFoundError, KeyError):
+        return {
+            'Nama Produk': [f"PRODUK {i}" for i in range(300)],
+            'Customer': [f"TOKO {i}" for i in range(120)],
+            'Kota': [f"KOTA {i}" for i in range(50)],
+        }
+
+
+def make_synthetic_sales(n_rows, vocabulary, months=12, seed=0):
+    """
+    Generates sales records in the penjualan_bersih schema.
+
+    Args:
+        n_rows (int): Number of sales rows.
+        vocabulary (dict): Output of load_vocabulary.
+        months (int): Number of consecutive months covered, starting January 2025.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: Synthetic sales records, sorted by date.
+    """
+    rng = np.random.default_rng(seed)
+    produk = np.array(vocabulary['Nama Produk'], dtype=object)
+    harga_produk = rng.integers(5, 400, len(produk)) * 100
+
+    # Customers always buy in the same city, like in the real exports
+    customer = np.array(vocabulary['Customer'], dtype=object)
+    kota_customer = rng.choice(np.array(vocabulary['Kota'], dtype=object), len(customer))
+
+    start = pd.Timestamp("2025-01-01")
+    days = (start + pd.DateOffset(months=months) - start).days
+
+    produk_idx = rng.integers(0, len(produk), n_rows)
+    customer_idx = rng.integers(0, len(customer), n_rows)
+    jumlah = rng.integers(1, 50, n_rows)
+    tanggal = start + pd.to_timedelta(rng.integers(0, days, n_rows), unit='D')
+
+    df = pd.DataFrame({
+        'Tanggal': tanggal,
+        'Customer': customer[customer_idx],
+        'Kota': kota_customer[customer_idx],
+        'Nama Produk': produk[produk_idx],
+        'Jumlah Terjual': jumlah,
+        'Harga Satuan': harga_produk[produk_idx],
+    })
+    df['Total Harga'] = df['Jumlah Terjual'] * df['Harga Satuan']
+    df['Bulan'] = df['Tanggal'].dt.strftime('%Y-%m')
+    return df.sort_values('Tanggal', kind='stable').reset_index(drop=True)
+
+
+def write_nota_xlsx(df, target):
+    """
+    Writes sales records in the raw nota export layout read by extract_sales_data_dynamic:
+    a 'TGL NOTA' header row, then one date row per nota followed by its product rows.
+
+    Args:
+        df (pd.DataFrame): Sales records in the penjualan_bersih schema.
+        target: Path or binary file object.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Nota")
+    ws.append(["LAPORAN PENJUALAN (SINTETIS)"])
+    ws.append([])
+    ws.append(["TGL NOTA", "NAMA CUSTOMER", "KOTA", "KD LGN"])
+    for (tanggal, customer, kota), nota in df.groupby(['Tanggal', 'Customer', 'Kota'], sort=False):
+        ws.append([tanggal.to_pydatetime(), customer, kota, None])
+        for nama_produk, jumlah, harga_satuan in nota[['Nama Produk', 'Jumlah Terjual', 'Harga Satuan']].itertuples(index=False, name=None):
+            ws.append([nama_produk, int(harga_satuan), None, int(jumlah)])
+    wb.save(target)
+
+
+def make_upload_files(df, formats, excel_max_rows):
+    """
+    Serializes a synthetic dataset once per upload format.
+
+    Args:
+        df (pd.DataFrame): Sales records in the penjualan_bersih schema.
+        formats (list): Subset of UPLOAD_FORMATS.
+        excel_max_rows (int): Excel formats are skipped above this row count.
+
+    Returns:
+        list: (format, file_name, content, mime_type) tuples.
+    """
+    files = []
+    for fmt in formats:
+        if fmt in ('xlsx', 'nota') and len(df) > excel_max_rows:
+            continue
+        buf = io.BytesIO()
+        if fmt == 'csv':
+            df.to_csv(buf, index=False)
+        elif fmt == 'parquet':
+            df.to_parquet(buf, index=False)
+        elif fmt == 'xlsx':
+            df.to_excel(buf, index=False)
+        elif fmt == 'nota':
+            write_nota_xlsx(df, buf)
+        ext = 'xlsx' if fmt == 'nota' else fmt
+        files.append((fmt, f"sintetis_{fmt}.{ext}", buf.getvalue(), MIME_TYPES[fmt]))
+    return files
+
+
+# ========================
+# Session Simulation
+# ========================
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # ru_maxrss is in KB on Linux
+
+
+def simulate_session(session_id, upload_files, rounds, seed, timeout):
+    """
+    Runs one dashboard session against app.py and times every rerun.
+
+    Args:
+        session_id (int): Session number (used in the report).
+        upload_files (list): Output of make_upload_files, uploaded in turn.
+        rounds (int): Number of interaction rounds.
+        seed (int): Random seed for the interaction choices.
+        timeout (float): Seconds allowed per rerun.
+
+    Returns:
+        dict: {'session', 'latencies' (interaction -> list of seconds), 'errors', 'peak_rss_mb'}
+    """
+    # Imported here so spawned workers pay the import cost outside the timed reruns
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    latencies = defaultdict(list)
+    errors = []
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    def rerun(interaction):
+        started = time.perf_counter()
+        try:
+            at.run()
+        except Exception as e:
+            errors.append(f"{interaction}: {e}")
+            return False
+        latencies[interaction].append(time.perf_counter() - started)
+        if at.exception:
+            errors.append(f"{interaction}: {at.exception[0].message}")
+            return False
+        return True
+
+    rerun('initial_load')
+    for round_idx in range(rounds):
+        if upload_files:
+            fmt, file_name, content, mime_type = upload_files[(session_id + round_idx) % len(upload_files)]
+            at.sidebar.file_uploader[0].set_value((file_name, content, mime_type))
+            if not rerun(f'upload[{fmt}]'):
+                continue
+
+        if len(at.sidebar.selectbox) < 2 or not at.sidebar.multiselect:
+            errors.append("dashboard filters not rendered")
+            continue
+
+        # Month range: both selectboxes trigger their own rerun in the browser
+        bulan_list = list(at.sidebar.selectbox[0].options)
+        dari, sampai = sorted(rng.sample(range(len(bulan_list)), 2)) if len(bulan_list) > 1 else (0, 0)
+        # Moving the start past the current end would rerun through the "Bulan Mulai tidak
+        # boleh setelah Bulan Sampai" stop; move the end first then, so every timed rerun is valid
+        selects = [(0, dari), (1, sampai)]
+        if dari > bulan_list.index(at.sidebar.selectbox[1].value):
+            selects.reverse()
+        for box, idx in selects:
+            at.sidebar.selectbox[box].select(bulan_list[idx])
+            rerun('month_range')
+
+        # Category toggles: untick one, then tick it again
+        kategori = at.sidebar.multiselect[0]
+        if len(kategori.value) > 1:
+            toggled = rng.choice(list(kategori.value))
+            kategori.unselect(toggled)
+            rerun('category_toggle')
+            at.sidebar.multiselect[0].select(toggled)
+            rerun('category_toggle')
+
+        for menu in rng.sample(MENU_OPTIONS, len(MENU_OPTIONS)):
+            if not at.main.selectbox:
+                break # Filters left no data; the script stopped before the menu
+            at.main.selectbox[0].select(menu)
+            rerun(f'menu[{menu}]')
+            if menu == "Repeat Order Pelanggan" and at.radio:
+                at.radio[0].set_value(rng.choice(METODE_OPTIONS))
+                rerun('metode_toggle')
+
+    return {
+        'session': session_id,
+        'latencies': dict(latencies),
+        'errors': errors,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _process_worker(workdir, queue, kwargs):
+    # The app reads its default penjualan_bersih.csv relative to the working directory
+    os.chdir(workdir)
+    rss_before = _peak_rss_mb()
+    try:
+        result = simulate_session(**kwargs)
+    except Exception as e:
+        result = {'session': kwargs['session_id'], 'latencies': {}, 'errors': [repr(e)], 'peak_rss_mb': _peak_rss_mb()}
+    result['baseline_rss_mb'] = rss_before
+    queue.put(result)
+
+
+def _collect_process_results(workers, queue, deadline):
+    """
+    Drains session results from the worker queue without blocking on dead or stuck workers.
+
+    A worker that exits without putting a result (segfault, OOM kill) or is still running at
+    the deadline is reported as a session error instead of hanging the load test.
+
+    Args:
+        workers (list): Started processes; workers[i] runs session i.
+        queue (multiprocessing.Queue): Queue the workers put their results on.
+        deadline (float): time.monotonic() value after which remaining workers are terminated.
+
+    Returns:
+        list: One result dict per session.
+    """
+    results = {}
+    # Drain the queue before joining so large results cannot block the workers
+    while len(results) < len(workers) and time.monotonic() < deadline:
+        try:
+            result = queue.get(timeout=RESULT_POLL_SECONDS)
+        except queue_module.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break # Everyone exited; whatever is missing will never arrive
+            continue
+        results[result['session']] = result
+
+    for session_id, worker in enumerate(workers):
+        timed_out = worker.is_alive() and session_id not in results
+        if timed_out:
+            worker.terminate()
+        worker.join()
+        if session_id in results:
+            if worker.exitcode:
+                results[session_id]['errors'].append(f"worker exited with code {worker.exitcode}")
+            continue
+        reason = "timed out" if timed_out else f"died with exit code {worker.exitcode}"
+        results[session_id] = {
+            'session': session_id,
+            'latencies': {},
+            'errors': [f"worker {reason} before reporting a result"],
+            'peak_rss_mb': None,
+            'baseline_rss_mb': None,
+        }
+    return list(results.values())
+
+
+def run_concurrent_sessions(n_sessions, workdir, upload_files, rounds, timeout, isolation, seed=0):
+    """
+    Starts n_sessions sessions at the same time and waits for all of them.
+
+    Args:
+        n_sessions (int): Number of concurrent sessions.
+        workdir (str): Directory holding the synthetic default penjualan_bersih.csv.
+        upload_files (list): Output of make_upload_files.
+        rounds (int): Interaction rounds per session.
+        timeout (float): Seconds allowed per rerun.
+        isolation (str): 'process' or 'thread'.
+        seed (int): Base random seed.
+
+    Returns:
+        tuple: (list of session results, wall-clock seconds)
+    """
+    session_kwargs = [
+        dict(session_id=i, upload_files=upload_files, rounds=rounds, seed=seed + i, timeout=timeout)
+        for i in range(n_sessions)
+    ]
+    started = time.perf_counter()
+
+    if isolation == 'process':
+        ctx = mp.get_context('spawn')
+        queue = ctx.Queue()
+        workers = [ctx.Process(target=_process_worker, args=(workdir, queue, kwargs)) for kwargs in session_kwargs]
+        for worker in workers:
+            worker.start()
+        # Upper bound on a healthy session: every rerun of every round hitting its timeout
+        reruns_per_session = 1 + rounds * (1 + 2 + 2 + len(MENU_OPTIONS) + 1)
+        deadline = time.monotonic() + WORKER_STARTUP_SECONDS + reruns_per_session * timeout
+        results = _collect_process_results(workers, queue, deadline)
+    else:
+        previous_cwd = os.getcwd()
+        os.chdir(workdir)
+        results = [None] * n_sessions
+
+        def target(i, kwargs):
+            try:
+                results[i] = simulate_session(**kwargs)
+            except Exception as e:
+                results[i] = {'session': i, 'latencies': {}, 'errors': [repr(e)]}
+
+        threads = [threading.Thread(target=target, args=(i, kwargs)) for i, kwargs in enumerate(session_kwargs)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            os.chdir(previous_cwd)
+        process_peak = _peak_rss_mb()
+        for result in results:
+            result['peak_rss_mb'] = None
+        results[0]['process_peak_rss_mb'] = process_peak
+
+    return sorted(results, key=lambda r: r['session']), time.perf_counter() - started
+
+
+# ========================
+# Reporting
+# ========================
+def summarize_latencies(results):
+    """
+    Pools per-interaction latencies over all sessions.
+
+    Args:
+        results (list): Session results from run_concurrent_sessions.
+
+    Returns:
+        pd.DataFrame: One row per interaction with count and p50/p90/p99/max in milliseconds.
+    """
+    pooled = defaultdict(list)
+    for result in results:
+        for interaction, values in result['latencies'].items():
+            pooled[interaction].extend(values)
+
+    rows = []
+    for interaction, values in sorted(pooled.items()):
+        ms = np.array(values) * 1000
+        rows.append({
+            'Interaksi': interaction,
+            'N': len(ms),
+            'p50 (ms)': np.percentile(ms, 50),
+            'p90 (ms)': np.percentile(ms, 90),
+            'p99 (ms)': np.percentile(ms, 99),
+            'max (ms)': ms.max(),
+        })
+    return pd.DataFrame(rows)
+
+
+def print_report(scale, results, wall_seconds, isolation):
+    print(f"\n=== {scale:,} baris | {len(results)} sesi ({isolation}) | wall {wall_seconds:.1f} s ===")
+    latency_table = summarize_latencies(results)
+    if not latency_table.empty:
+        print(latency_table.round(1).to_string(index=False))
+
+    if isolation == 'process':
+        for result in results:
+            peak, base = result.get('peak_rss_mb'), result.get('baseline_rss_mb')
+            if peak is not None:
+                print(f"sesi {result['session']}: peak RSS {peak:.0f} MB (+{peak - base:.0f} MB setelah start)")
+        peaks = [r['peak_rss_mb'] for r in results if r.get('peak_rss_mb') is not None]
+        if peaks:
+            print(f"peak RSS per sesi: median {statistics.median(peaks):.0f} MB, max {max(peaks):.0f} MB")
+    elif results and results[0].get('process_peak_rss_mb') is not None:
+        print(f"peak RSS proses (semua sesi): {results[0]['process_peak_rss_mb']:.0f} MB")
+
+    n_errors = sum(len(r['errors']) for r in results)
+    if n_errors:
+        print(f"{n_errors} error, contoh: {next(e for r in results for e in r['errors'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the sales dashboard using Streamlit AppTest.")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent sessions per scale.")
+    parser.add_argument("--scales", type=int, nargs='+', default=[5000, 50000, 200000], help="Synthetic row counts.")
+    parser.add_argument("--rounds", type=int, default=2, help="Interaction rounds per session.")
+    parser.add_argument("--months", type=int, default=12, help="Months covered by the synthetic data.")
+    parser.add_argument("--formats", nargs='+', choices=UPLOAD_FORMATS, default=UPLOAD_FORMATS, help="Upload formats to cycle through.")
+    parser.add_argument("--excel-max-rows", type=int, default=20000, help="Skip Excel uploads above this row count.")
+    parser.add_argument("--isolation", choices=['process', 'thread'], default='process')
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds allowed per rerun.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write raw per-session results to this file.")
+    args = parser.parse_args()
+
+    vocabulary = load_vocabulary()
+    report = {}
+    for scale in args.scales:
+        df = make_synthetic_sales(scale, vocabulary, months=args.months, seed=args.seed)
+        upload_files = make_upload_files(df, args.formats, args.excel_max_rows)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            # Default dataset of the same scale, shown before anything is uploaded
+            df.to_csv(os.path.join(workdir, "penjualan_bersih.csv"), index=False)
+            results, wall_seconds = run_concurrent_sessions(
+                args.sessions, workdir, upload_files, args.rounds, args.timeout, args.isolation, seed=args.seed
+            )
+
+        print_report(scale, results, wall_seconds, args.isolation)
+        report[scale] = {'wall_seconds': wall_seconds, 'sessions': results}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()